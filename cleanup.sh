@@ -6,6 +6,10 @@
 # Don't exit on errors - we want to continue cleanup even if some resources fail
 set +e
 
+# Let the AWS CLI pace itself under throttling, since deletes run concurrently
+export AWS_RETRY_MODE=adaptive
+export AWS_MAX_ATTEMPTS=10
+
 # Function to safely run AWS commands with retries
 safe_aws_command() {
     local max_attempts=3
@@ -26,6 +30,65 @@ safe_aws_command() {
     return 1
 }
 
+# Cap on concurrent background AWS CLI calls, to stay clear of throttling
+MAX_PARALLEL=8
+
+RUNNING_JOBS=0
+
+# Function to count a background job about to start, first waiting for the
+# current batch once MAX_PARALLEL are running (plain wait, so bash 3.2 on
+# macOS works too)
+wait_for_slot() {
+    if [ $RUNNING_JOBS -ge $MAX_PARALLEL ]; then
+        wait
+        RUNNING_JOBS=0
+    fi
+    RUNNING_JOBS=$((RUNNING_JOBS + 1))
+}
+
+# Function to wait for all background jobs and start counting afresh
+wait_for_all() {
+    wait
+    RUNNING_JOBS=0
+}
+
+# Function to wait until a backup vault has no recovery points, polling at
+# 1s, 2s, 4s ... up to 30s and starting over whenever the count changes
+wait_for_empty_vault() {
+    local vault_name=$1
+    local profile=$2
+    local timeout=${3:-600}
+    local delay=1
+    local waited=0
+    local last_count=""
+    
+    while [ $waited -lt $timeout ]; do
+        local count=$(aws backup list-recovery-points-by-backup-vault \
+            --backup-vault-name "$vault_name" \
+            --query 'length(RecoveryPoints)' \
+            --output text \
+            --region us-east-1 \
+            --profile "$profile" 2>/dev/null || echo "0")
+        
+        if [[ -z "$count" || "$count" == "0" || "$count" == "None" ]]; then
+            return 0
+        fi
+        
+        if [[ "$count" != "$last_count" ]]; then
+            delay=1
+            last_count=$count
+        fi
+        
+        echo "  $count recovery point(s) left in $vault_name, checking again in ${delay}s..."
+        sleep $delay
+        waited=$((waited + delay))
+        delay=$((delay * 2 > 30 ? 30 : delay * 2))
+    done
+    
+    echo "Timed out waiting for $vault_name to empty"
+    return 1
+}
+
 # Function to get target account ID
 get_target_account_id() {
     # Try to get from target profile
@@ -54,6 +117,7 @@ echo "Starting cleanup process..."
 # Step 1: Delete restored clusters first (they depend on snapshots)
 echo "=== Step 1: Deleting restored Redshift clusters ==="
 RESTORED_CLUSTERS=("aca-restored-cluster" "restored-demo-cluster")
+DELETING_CLUSTERS=()
 
 for cluster in "${RESTORED_CLUSTERS[@]}"; do
     echo "Checking for cluster: $cluster"
@@ -61,9 +125,8 @@ for cluster in "${RESTORED_CLUSTERS[@]}"; do
         echo "Deleting cluster: $cluster"
         safe_aws_command "aws redshift delete-cluster --cluster-identifier $cluster --skip-final-cluster-snapshot --region us-east-1"
         
-        # Wait for deletion to start
-        echo "Waiting for cluster deletion to start..."
-        sleep 30
+        # Deletion continues in the background; waited on in Step 4
+        DELETING_CLUSTERS+=("$cluster")
     else
         echo "Cluster $cluster not found or already deleted"
     fi
@@ -87,34 +150,30 @@ SHARED_SNAPSHOTS=$(aws redshift describe-cluster-snapshots \
 for snapshot in $SHARED_SNAPSHOTS; do
     if [[ -n "$snapshot" && "$snapshot" != "None" ]]; then
         echo "Revoking cross-account access for snapshot: $snapshot"
+        wait_for_slot
         # Try to revoke access - this might fail if not shared, which is OK
         aws redshift revoke-snapshot-access \
             --snapshot-identifier "$snapshot" \
             --account-with-restore-access "$TARGET_ACCOUNT" \
             --region us-east-1 \
-            --profile source 2>/dev/null || echo "  (No cross-account access to revoke or already revoked)"
+            --profile source 2>/dev/null || echo "  (No cross-account access to revoke or already revoked)" &
     fi
 done
-
-# Wait a moment for revocation to take effect
-echo "Waiting for access revocation to take effect..."
-sleep 10
+wait_for_all
 
 # Now delete snapshots from source account
+# (same set as listed above, so reuse it rather than describing again)
+# Independent deletes in this script run as background jobs, in batches
+# of MAX_PARALLEL, and are collected with a single wait
 echo "Deleting snapshots from source account..."
-SNAPSHOTS=$(aws redshift describe-cluster-snapshots \
-    --snapshot-type manual \
-    --query 'Snapshots[?starts_with(SnapshotIdentifier, `demo-snapshot`) || starts_with(SnapshotIdentifier, `copied-`)].SnapshotIdentifier' \
-    --output text \
-    --region us-east-1 \
-    --profile source 2>/dev/null || echo "")
-
-for snapshot in $SNAPSHOTS; do
+for snapshot in $SHARED_SNAPSHOTS; do
     if [[ -n "$snapshot" && "$snapshot" != "None" ]]; then
         echo "Deleting source snapshot: $snapshot"
-        safe_aws_command "aws redshift delete-cluster-snapshot --snapshot-identifier $snapshot --region us-east-1 --profile source"
+        wait_for_slot
+        safe_aws_command "aws redshift delete-cluster-snapshot --snapshot-identifier $snapshot --region us-east-1 --profile source" &
     fi
 done
+wait_for_all
 
 # Note: We don't need to delete from target account since shared snapshots are owned by source
 echo "Note: Shared snapshots are owned by source account and deleted above"
@@ -149,7 +208,8 @@ RECOVERY_POINTS=$(aws backup list-recovery-points-by-backup-vault \
 for rp_arn in $RECOVERY_POINTS; do
     if [[ -n "$rp_arn" && "$rp_arn" != "None" ]]; then
         echo "Deleting recovery point: $rp_arn"
-        safe_aws_command "aws backup delete-recovery-point --backup-vault-name aca-redshift-vault --recovery-point-arn '$rp_arn' --region us-east-1 --profile source"
+        wait_for_slot
+        safe_aws_command "aws backup delete-recovery-point --backup-vault-name aca-redshift-vault --recovery-point-arn '$rp_arn' --region us-east-1 --profile source" &
     fi
 done
 
@@ -164,13 +224,16 @@ TARGET_RECOVERY_POINTS=$(aws backup list-recovery-points-by-backup-vault \
 for rp_arn in $TARGET_RECOVERY_POINTS; do
     if [[ -n "$rp_arn" && "$rp_arn" != "None" ]]; then
         echo "Deleting target recovery point: $rp_arn"
-        safe_aws_command "aws backup delete-recovery-point --backup-vault-name aca-redshift-cross-account-vault --recovery-point-arn '$rp_arn' --region us-east-1 --profile target"
+        wait_for_slot
+        safe_aws_command "aws backup delete-recovery-point --backup-vault-name aca-redshift-cross-account-vault --recovery-point-arn '$rp_arn' --region us-east-1 --profile target" &
     fi
 done
+wait_for_all
 
 # Wait for recovery points to be deleted
 echo "Waiting for recovery points to be deleted..."
-sleep 60
+wait_for_empty_vault aca-redshift-vault source
+wait_for_empty_vault aca-redshift-cross-account-vault target
 
 # Then delete backup plans and selections
 echo "Deleting backup plans from source account..."
@@ -205,10 +268,27 @@ for plan_id in $BACKUP_PLANS; do
     fi
 done
 
-# Finally, delete backup vaults (they must be empty)
-echo "Waiting before attempting to delete backup vaults..."
-sleep 30
+# Forget the plan and selection IDs the backup demo saved, so a redeploy
+# doesn't start from IDs that no longer exist
+echo "Deleting saved backup plan and selection IDs..."
+for path in /aca/backup-plan-id /aca/backup-selection-id; do
+    SAVED_IDS=$(aws ssm get-parameters-by-path \
+        --path "$path" \
+        --recursive \
+        --query 'Parameters[].Name' \
+        --output text \
+        --region us-east-1 \
+        --profile source 2>/dev/null || echo "")
+    
+    for parameter in $SAVED_IDS; do
+        if [[ -n "$parameter" && "$parameter" != "None" ]]; then
+            echo "Deleting parameter: $parameter"
+            aws ssm delete-parameter --name "$parameter" --region us-east-1 --profile source || echo "Could not delete $parameter"
+        fi
+    done
+done
 
+# Finally, delete backup vaults (they must be empty, which was waited for above)
 echo "Attempting to delete backup vaults..."
 safe_aws_command "aws backup delete-backup-vault --backup-vault-name aca-redshift-vault --region us-east-1 --profile source" || echo "Could not delete source vault (may not exist or not empty)"
 safe_aws_command "aws backup delete-backup-vault --backup-vault-name aca-redshift-cross-account-vault --region us-east-1 --profile target" || echo "Could not delete target vault (may not exist or not empty)"
@@ -216,6 +296,13 @@ safe_aws_command "aws backup delete-backup-vault --backup-vault-name aca-redshif
 # Step 4: Wait for cluster deletions to complete
 echo "=== Step 4: Waiting for cluster deletions ==="
 
+for cluster in "${DELETING_CLUSTERS[@]}"; do
+    echo "Waiting for restored cluster deletion: $cluster"
+    aws redshift wait cluster-deleted \
+        --cluster-identifier "$cluster" \
+        --region us-east-1 || echo "Cluster $cluster deletion wait timed out or failed"
+done
+
 # Check if main cluster exists and wait for its deletion
 if aws redshift describe-clusters --cluster-identifier aca-redshift-cluster --region us-east-1 --profile source >/dev/null 2>&1; then
     echo "Main cluster still exists, waiting for deletion..."
@@ -277,21 +364,29 @@ else
     echo "✅ No remaining clusters found"
 fi
 
-# Check for remaining stacks
+# Check for remaining stacks (both accounts queried concurrently)
 echo "Checking for remaining CloudFormation stacks..."
-SOURCE_STACKS=$(aws cloudformation list-stacks \
+SOURCE_STACKS_FILE=$(mktemp)
+TARGET_STACKS_FILE=$(mktemp)
+
+aws cloudformation list-stacks \
     --stack-status-filter CREATE_COMPLETE UPDATE_COMPLETE \
     --query 'StackSummaries[?starts_with(StackName, `aca-redshift`)].StackName' \
     --output text \
     --region us-east-1 \
-    --profile source 2>/dev/null || echo "")
+    --profile source > "$SOURCE_STACKS_FILE" 2>/dev/null &
 
-TARGET_STACKS=$(aws cloudformation list-stacks \
+aws cloudformation list-stacks \
     --stack-status-filter CREATE_COMPLETE UPDATE_COMPLETE \
     --query 'StackSummaries[?starts_with(StackName, `aca-redshift`)].StackName' \
     --output text \
     --region us-east-1 \
-    --profile target 2>/dev/null || echo "")
+    --profile target > "$TARGET_STACKS_FILE" 2>/dev/null &
+
+wait
+SOURCE_STACKS=$(cat "$SOURCE_STACKS_FILE")
+TARGET_STACKS=$(cat "$TARGET_STACKS_FILE")
+rm -f "$SOURCE_STACKS_FILE" "$TARGET_STACKS_FILE"
 
 if [[ -n "$SOURCE_STACKS" && "$SOURCE_STACKS" != "None" ]]; then
     echo "⚠️  Warning: Found remaining source stacks: $SOURCE_STACKS"
@@ -314,6 +409,7 @@ echo "  • Restored Redshift clusters"
 echo "  • Manual snapshots (source and target accounts)"
 echo "  • AWS Backup recovery points"
 echo "  • AWS Backup plans and selections"
+echo "  • Saved backup plan and selection IDs in SSM"
 echo "  • AWS Backup vaults"
 echo "  • CloudFormation stacks"
 echo
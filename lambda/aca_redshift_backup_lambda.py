@@ -18,92 +18,184 @@ ACA Redshift Lambda Backup Function
 Serverless implementation of native Redshift snapshot sharing
 """
 
+import base64
 import json
 import boto3
-import time
-from datetime import datetime
+import hashlib
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from botocore.exceptions import ClientError, WaiterError
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any
 import logging
 
+# Attributes present on every LogRecord; anything else was passed via `extra`
+_LOG_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Emit one JSON object per record so CloudWatch Logs Insights can query fields directly"""
+    def format(self, record):
+        entry = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _LOG_RECORD_ATTRS})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+if not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+for handler in logger.handlers:
+    handler.setFormatter(JsonFormatter())
+
+# Snapshot name prefixes owned by this function; only these are subject to retention cleanup
+SNAPSHOT_PREFIXES = ('aca-lambda-snapshot-',)
+
+# Step Functions workflow that waits for the snapshot and shares it (optional)
+STATE_MACHINE_ARN = os.environ.get('STATE_MACHINE_ARN')
+
+# Clients are created once per container and reused across warm invocations
+_CLIENT_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    max_pool_connections=32,
+    connect_timeout=3,
+    read_timeout=30
+)
+_REDSHIFT = boto3.client('redshift', config=_CLIENT_CONFIG)
+_STS = boto3.client('sts', config=_CLIENT_CONFIG)
+_STEPFUNCTIONS = boto3.client('stepfunctions', config=_CLIENT_CONFIG)
+_SOURCE_ACCOUNT_ID = None
+
+def get_source_account_id() -> str:
+    """Look up the source account ID once per container"""
+    global _SOURCE_ACCOUNT_ID
+    if _SOURCE_ACCOUNT_ID is None:
+        _SOURCE_ACCOUNT_ID = _STS.get_caller_identity()['Account']
+    return _SOURCE_ACCOUNT_ID
 
 class AcaRedshiftBackupLambda:
     def __init__(self):
         """Initialize with Lambda execution role credentials"""
-        self.source_redshift = boto3.client('redshift')
-        self.target_redshift = boto3.client('redshift', region_name='us-east-1')  # Cross-account client
+        self.source_redshift = _REDSHIFT
         
         # Get account info from STS
-        sts = boto3.client('sts')
-        identity = sts.get_caller_identity()
-        self.source_account_id = identity['Account']
+        self.source_account_id = get_source_account_id()
         
-        logger.info(f"Lambda initialized for source account: {self.source_account_id}")
+        logger.info("Lambda initialized for source account: %s", self.source_account_id)
 
-    def create_manual_snapshot(self, cluster_identifier: str, target_account_id: str) -> str:
+    def create_manual_snapshot(self, cluster_identifier: str, target_account_id: str,
+                               request_id: str = None) -> str:
         """Create a manual snapshot of the Redshift cluster"""
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        snapshot_identifier = f"aca-lambda-snapshot-{timestamp}"
         
-        logger.info(f"Creating manual snapshot: {snapshot_identifier}")
+        # Derive the identifier from the request ID so a retried invocation
+        # finds its existing snapshot instead of creating a second one
+        tags = [
+            {'Key': 'Purpose', 'Value': 'AcaCrossAccountBackup'},
+            {'Key': 'CreatedBy', 'Value': 'AcaLambdaFunction'},
+            {'Key': 'TargetAccount', 'Value': target_account_id},
+            {'Key': 'Timestamp', 'Value': timestamp}
+        ]
+        if request_id:
+            tag = base64.b32encode(hashlib.sha1(request_id.encode()).digest())[:12].decode().lower()
+            snapshot_identifier = f"aca-lambda-snapshot-{tag}"
+            tags.append({'Key': 'RequestId', 'Value': request_id})
+        else:
+            snapshot_identifier = f"aca-lambda-snapshot-{timestamp}"
+        
+        logger.info("Creating manual snapshot: %s", snapshot_identifier)
         
         try:
             response = self.source_redshift.create_cluster_snapshot(
                 SnapshotIdentifier=snapshot_identifier,
                 ClusterIdentifier=cluster_identifier,
-                Tags=[
-                    {'Key': 'Purpose', 'Value': 'AcaCrossAccountBackup'},
-                    {'Key': 'CreatedBy', 'Value': 'AcaLambdaFunction'},
-                    {'Key': 'TargetAccount', 'Value': target_account_id},
-                    {'Key': 'Timestamp', 'Value': timestamp}
-                ]
+                Tags=tags
             )
             
-            logger.info(f"Snapshot creation initiated: {snapshot_identifier}")
+            logger.info("Snapshot creation initiated: %s", snapshot_identifier,
+                        extra={'snapshot_id': snapshot_identifier, 'cluster_identifier': cluster_identifier})
             return snapshot_identifier
             
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ClusterSnapshotAlreadyExists':
+                logger.info("Snapshot already exists, reusing: %s", snapshot_identifier)
+                return snapshot_identifier
+            logger.error("Error creating snapshot: %s", e)
+            raise
         except Exception as e:
-            logger.error(f"Error creating snapshot: {str(e)}")
+            logger.error("Error creating snapshot: %s", e)
             raise
 
-    def wait_for_snapshot_completion(self, snapshot_identifier: str, max_wait_minutes: int = 15) -> bool:
+    def wait_for_snapshot_completion(self, snapshot_identifier: str, max_wait_minutes: int = 15,
+                                     cluster_identifier: str = None) -> bool:
         """Wait for snapshot to complete (with Lambda timeout considerations)"""
-        logger.info(f"Waiting for snapshot completion: {snapshot_identifier}")
-        start_time = time.time()
-        max_wait_seconds = max_wait_minutes * 60
-        
-        while time.time() - start_time < max_wait_seconds:
-            try:
-                response = self.source_redshift.describe_cluster_snapshots(
-                    SnapshotIdentifier=snapshot_identifier
-                )
-                
-                if response['Snapshots']:
-                    status = response['Snapshots'][0]['Status']
-                    logger.info(f"Snapshot status: {status}")
-                    
-                    if status == 'available':
-                        logger.info(f"Snapshot completed successfully: {snapshot_identifier}")
-                        return True
-                    elif status == 'failed':
-                        logger.error("Snapshot creation failed")
-                        raise Exception("Snapshot creation failed")
-                
-                time.sleep(30)  # Check every 30 seconds
-                
-            except Exception as e:
-                logger.error(f"Error checking snapshot status: {str(e)}")
-                time.sleep(30)
+        logger.info("Waiting for snapshot completion: %s", snapshot_identifier)
+        
+        # The built-in waiter stops as soon as the snapshot reaches a terminal
+        # state instead of sleeping out a fixed 30 second interval
+        waiter = self.source_redshift.get_waiter('snapshot_available')
+        
+        # Scope each describe call to the owning cluster and a small page
+        describe_args = {'SnapshotIdentifier': snapshot_identifier, 'MaxRecords': 20}
+        if cluster_identifier:
+            describe_args['ClusterIdentifier'] = cluster_identifier
+        
+        try:
+            waiter.wait(
+                **describe_args,
+                WaiterConfig={
+                    'Delay': 15,
+                    'MaxAttempts': max_wait_minutes * 4
+                }
+            )
+            
+            logger.info("Snapshot completed successfully: %s", snapshot_identifier)
+            return True
+            
+        except WaiterError as e:
+            if 'Max attempts exceeded' in str(e):
+                # If we reach here, snapshot is still in progress
+                logger.warning("Snapshot still in progress after %s minutes", max_wait_minutes)
+                return False
+            
+            logger.error("Snapshot creation failed: %s", e)
+            raise Exception("Snapshot creation failed")
+
+    def start_snapshot_workflow(self, snapshot_identifier: str, cluster_identifier: str,
+                                target_account_id: str) -> str:
+        """Hand the snapshot off to Step Functions to wait for completion and share it"""
+        logger.info("Starting snapshot workflow for: %s", snapshot_identifier)
         
-        # If we reach here, snapshot is still in progress
-        logger.warning(f"Snapshot still in progress after {max_wait_minutes} minutes")
-        return False
+        try:
+            response = _STEPFUNCTIONS.start_execution(
+                stateMachineArn=STATE_MACHINE_ARN,
+                name=snapshot_identifier,
+                input=json.dumps({
+                    'snapshot_id': snapshot_identifier,
+                    'cluster_identifier': cluster_identifier,
+                    'target_account_id': target_account_id
+                })
+            )
+            
+            logger.info("Snapshot workflow started: %s", response['executionArn'],
+                        extra={'snapshot_id': snapshot_identifier, 'execution_arn': response['executionArn']})
+            return response['executionArn']
+            
+        except Exception as e:
+            logger.error("Error starting snapshot workflow: %s", e)
+            raise
 
     def share_snapshot_with_account(self, snapshot_identifier: str, target_account_id: str) -> bool:
         """Share snapshot with target account"""
-        logger.info(f"Sharing snapshot {snapshot_identifier} with account {target_account_id}")
+        logger.info("Sharing snapshot %s with account %s", snapshot_identifier, target_account_id)
         
         try:
             response = self.source_redshift.authorize_snapshot_access(
@@ -111,49 +203,67 @@ class AcaRedshiftBackupLambda:
                 AccountWithRestoreAccess=target_account_id
             )
             
-            logger.info("Snapshot shared successfully")
+            logger.info("Snapshot shared successfully",
+                        extra={'snapshot_id': snapshot_identifier, 'target_account_id': target_account_id})
             return True
             
         except Exception as e:
-            logger.error(f"Error sharing snapshot: {str(e)}")
+            logger.error("Error sharing snapshot: %s", e)
             return False
 
     def cleanup_old_snapshots(self, cluster_identifier: str, retention_days: int = 7) -> int:
         """Clean up old snapshots based on retention policy"""
-        logger.info(f"Cleaning up snapshots older than {retention_days} days")
+        logger.info("Cleaning up snapshots older than %s days", retention_days)
         
         try:
-            # Get all manual snapshots for this cluster
-            response = self.source_redshift.describe_cluster_snapshots(
+            cutoff_time = datetime.now(timezone.utc) - timedelta(days=retention_days)
+            
+            # Page through manual snapshots for this cluster, letting Redshift
+            # filter out anything created after the retention cutoff
+            paginator = self.source_redshift.get_paginator('describe_cluster_snapshots')
+            pages = paginator.paginate(
                 ClusterIdentifier=cluster_identifier,
-                SnapshotType='manual'
+                SnapshotType='manual',
+                EndTime=cutoff_time,
+                PaginationConfig={'PageSize': 100}
             )
             
+            # Only delete our Lambda-created snapshots
+            to_delete = [
+                snapshot['SnapshotIdentifier']
+                for snapshot in itertools.chain.from_iterable(page['Snapshots'] for page in pages)
+                if snapshot['SnapshotIdentifier'].startswith(SNAPSHOT_PREFIXES)
+                and snapshot['SnapshotCreateTime'] < cutoff_time
+            ]
+            
             deleted_count = 0
-            cutoff_time = datetime.now().timestamp() - (retention_days * 24 * 3600)
             
-            for snapshot in response.get('Snapshots', []):
-                snapshot_id = snapshot['SnapshotIdentifier']
+            # Deletes are independent, so issue them concurrently; 16 workers
+            # stays well within Redshift's API rate limits
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                futures = {
+                    executor.submit(
+                        self.source_redshift.delete_cluster_snapshot,
+                        SnapshotIdentifier=snapshot_id
+                    ): snapshot_id
+                    for snapshot_id in to_delete
+                }
                 
-                # Only delete our Lambda-created snapshots
-                if snapshot_id.startswith('aca-lambda-snapshot-'):
-                    snapshot_time = snapshot['SnapshotCreateTime'].timestamp()
-                    
-                    if snapshot_time < cutoff_time:
-                        logger.info(f"Deleting old snapshot: {snapshot_id}")
-                        try:
-                            self.source_redshift.delete_cluster_snapshot(
-                                SnapshotIdentifier=snapshot_id
-                            )
-                            deleted_count += 1
-                        except Exception as e:
-                            logger.warning(f"Could not delete snapshot {snapshot_id}: {str(e)}")
-            
-            logger.info(f"Cleaned up {deleted_count} old snapshots")
+                for future in as_completed(futures):
+                    snapshot_id = futures[future]
+                    try:
+                        future.result()
+                        logger.info("Deleted old snapshot: %s", snapshot_id)
+                        deleted_count += 1
+                    except Exception as e:
+                        logger.warning("Could not delete snapshot %s: %s", snapshot_id, e)
+            
+            logger.info("Cleaned up %s old snapshots", deleted_count,
+                        extra={'cluster_identifier': cluster_identifier, 'deleted_count': deleted_count})
             return deleted_count
             
         except Exception as e:
-            logger.error(f"Error during cleanup: {str(e)}")
+            logger.error("Error during cleanup: %s", e)
             return 0
 
 def lambda_handler(event, context):
@@ -169,7 +279,8 @@ def lambda_handler(event, context):
     }
     """
     
-    logger.info(f"Lambda invoked with event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Lambda invoked with event: %s", json.dumps(event))
     
     try:
         # Parse event parameters
@@ -185,7 +296,9 @@ def lambda_handler(event, context):
         backup_handler = AcaRedshiftBackupLambda()
         
         # Create snapshot
-        snapshot_id = backup_handler.create_manual_snapshot(cluster_identifier, target_account_id)
+        snapshot_id = backup_handler.create_manual_snapshot(
+            cluster_identifier, target_account_id, getattr(context, 'aws_request_id', None)
+        )
         
         result = {
             'statusCode': 200,
@@ -196,29 +309,43 @@ def lambda_handler(event, context):
             'status': 'snapshot_initiated'
         }
         
-        # Optionally wait for completion (for smaller snapshots)
-        if wait_for_completion:
-            completed = backup_handler.wait_for_snapshot_completion(snapshot_id, max_wait_minutes=10)
-            if completed:
-                # Share the snapshot
-                shared = backup_handler.share_snapshot_with_account(snapshot_id, target_account_id)
-                result['shared'] = shared
-                result['status'] = 'completed_and_shared' if shared else 'completed_not_shared'
+        # Clean up old snapshots. This doesn't depend on the new snapshot, so it
+        # runs alongside the wait below instead of after it
+        with ThreadPoolExecutor(max_workers=1) as cleanup_executor:
+            cleanup = cleanup_executor.submit(
+                backup_handler.cleanup_old_snapshots, cluster_identifier, retention_days
+            )
+            
+            # Optionally wait for completion (for smaller snapshots)
+            if wait_for_completion and STATE_MACHINE_ARN:
+                # Let Step Functions poll the snapshot so the wait is not billed as Lambda duration
+                execution_arn = backup_handler.start_snapshot_workflow(
+                    snapshot_id, cluster_identifier, target_account_id
+                )
+                result['execution_arn'] = execution_arn
+                result['status'] = 'snapshot_workflow_started'
+            elif wait_for_completion:
+                completed = backup_handler.wait_for_snapshot_completion(
+                    snapshot_id, max_wait_minutes=10, cluster_identifier=cluster_identifier
+                )
+                if completed:
+                    # Share the snapshot
+                    shared = backup_handler.share_snapshot_with_account(snapshot_id, target_account_id)
+                    result['shared'] = shared
+                    result['status'] = 'completed_and_shared' if shared else 'completed_not_shared'
+                else:
+                    result['status'] = 'snapshot_in_progress'
             else:
-                result['status'] = 'snapshot_in_progress'
-        else:
-            # For async operation, trigger sharing via another Lambda or Step Function
-            result['status'] = 'snapshot_initiated_async'
-        
-        # Clean up old snapshots
-        deleted_count = backup_handler.cleanup_old_snapshots(cluster_identifier, retention_days)
-        result['cleaned_up_snapshots'] = deleted_count
+                # For async operation, trigger sharing via another Lambda or Step Function
+                result['status'] = 'snapshot_initiated_async'
+            
+            result['cleaned_up_snapshots'] = cleanup.result()
         
-        logger.info(f"Lambda completed successfully: {json.dumps(result)}")
+        logger.info("Lambda completed successfully: %s", json.dumps(result))
         return result
         
     except Exception as e:
-        logger.error(f"Lambda execution failed: {str(e)}")
+        logger.error("Lambda execution failed: %s", e)
         return {
             'statusCode': 500,
             'error': str(e),
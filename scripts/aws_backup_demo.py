@@ -20,26 +20,143 @@ Demonstrates cross-account Redshift backup using AWS Backup service
 
 import boto3
 import json
+import os
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Any, Callable, Dict
+
+# Stack outputs only change on stack updates, so reuse them across runs for a while
+STACK_OUTPUTS_CACHE_FILE = os.path.expanduser('~/.cache/aws_backup_demo.json')
+STACK_OUTPUTS_CACHE_TTL = 600  # 10 minutes
+
+# Backoff for calls that pass a just-created IAM role while IAM propagates it
+ROLE_PROPAGATION_DELAYS = (0.5, 1, 2, 4, 8)
+
+# Adaptive retries pace requests client-side instead of backing off after throttling
+CLIENT_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    max_pool_connections=32,
+    connect_timeout=3,
+    read_timeout=30
+)
 
 class AWSBackupDemo:
-    def __init__(self, source_profile: str = None, target_profile: str = None):
+    def __init__(self, source_profile: str = None, target_profile: str = None,
+                 prefetch_stacks: tuple = ()):
         """Initialize with AWS profiles for source and target accounts"""
         self.source_session = boto3.Session(profile_name=source_profile) if source_profile else boto3.Session()
         self.target_session = boto3.Session(profile_name=target_profile) if target_profile else boto3.Session()
         
-        self.source_backup = self.source_session.client('backup')
-        self.target_backup = self.target_session.client('backup')
-        self.source_iam = self.source_session.client('iam')
+        self.source_backup = self.source_session.client('backup', config=CLIENT_CONFIG)
+        self.target_backup = self.target_session.client('backup', config=CLIENT_CONFIG)
+        self.source_iam = self.source_session.client('iam', config=CLIENT_CONFIG)
+        self.source_ssm = self.source_session.client('ssm', config=CLIENT_CONFIG)
+        self.source_sqs = self.source_session.client('sqs', config=CLIENT_CONFIG)
+        
+        self._stack_outputs = {}
         
-        self.source_account_id = self.source_session.client('sts').get_caller_identity()['Account']
-        self.target_account_id = self.target_session.client('sts').get_caller_identity()['Account']
+        # Stacks already in the disk cache are served from it by get_stack_outputs
+        # (which also checks the account), so only prefetch the others
+        cache = self._read_stack_outputs_cache()
+        cached_stacks = {key.split(':', 1)[1] for key in cache}
+        
+        # Look up both account IDs, and any uncached stacks the caller will need, concurrently
+        with ThreadPoolExecutor(max_workers=2 + len(prefetch_stacks)) as executor:
+            source_identity = executor.submit(self.source_session.client('sts', config=CLIENT_CONFIG).get_caller_identity)
+            target_identity = executor.submit(self.target_session.client('sts', config=CLIENT_CONFIG).get_caller_identity)
+            stack_futures = {stack_name: executor.submit(self._describe_stack_outputs, stack_name)
+                             for stack_name in prefetch_stacks if stack_name not in cached_stacks}
+            self.source_account_id = source_identity.result()['Account']
+            self.target_account_id = target_identity.result()['Account']
+        
+        for stack_name, future in stack_futures.items():
+            try:
+                self._store_stack_outputs(stack_name, future.result(), cache)
+            except (ClientError, KeyError) as e:
+                # e.g. a stack still being created has no Outputs yet;
+                # get_stack_outputs tries again and reports it
+                print(f"Could not prefetch stack {stack_name}: {str(e)}")
         
         print(f"Source Account: {self.source_account_id}")
         print(f"Target Account: {self.target_account_id}")
 
+    def _get_saved_id(self, parameter_name: str, exists: Callable[[str], bool]) -> str:
+        """Read a resource ID saved by a previous run, or None if there isn't one or it is stale"""
+        try:
+            response = self.source_ssm.get_parameter(Name=parameter_name)
+            resource_id = response['Parameter']['Value']
+        except ClientError:
+            return None
+        
+        # The resource may have been deleted (e.g. by cleanup.sh) since it was saved
+        try:
+            if exists(resource_id):
+                return resource_id
+        except ClientError:
+            pass
+        print(f"Ignoring stale {parameter_name}: {resource_id}")
+        return None
+
+    def _save_id(self, parameter_name: str, resource_id: str):
+        """Save a resource ID so later runs can skip the list-and-scan lookup"""
+        try:
+            self.source_ssm.put_parameter(
+                Name=parameter_name,
+                Value=resource_id,
+                Type='String',
+                Overwrite=True
+            )
+        except ClientError as e:
+            print(f"Could not save {parameter_name}: {str(e)}")
+
+    def _describe_stack_outputs(self, stack_name: str) -> Dict[str, str]:
+        """Fetch CloudFormation stack outputs from the source account"""
+        cf_client = self.source_session.client('cloudformation', config=CLIENT_CONFIG)
+        stack = cf_client.describe_stacks(StackName=stack_name)
+        return {output['OutputKey']: output['OutputValue']
+                for output in stack['Stacks'][0]['Outputs']}
+
+    def _read_stack_outputs_cache(self) -> dict:
+        """Read the on-disk stack outputs cache, or an empty one if it is missing or stale"""
+        try:
+            if time.time() - os.path.getmtime(STACK_OUTPUTS_CACHE_FILE) < STACK_OUTPUTS_CACHE_TTL:
+                with open(STACK_OUTPUTS_CACHE_FILE) as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _store_stack_outputs(self, stack_name: str, outputs: Dict[str, str], cache: dict):
+        """Remember stack outputs in memory and on disk"""
+        self._stack_outputs[stack_name] = outputs
+        cache[f"{self.source_account_id}:{stack_name}"] = outputs
+        try:
+            os.makedirs(os.path.dirname(STACK_OUTPUTS_CACHE_FILE), exist_ok=True)
+            with open(STACK_OUTPUTS_CACHE_FILE, 'w') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            print(f"Could not cache stack outputs: {str(e)}")
+
+    def get_stack_outputs(self, stack_name: str) -> Dict[str, str]:
+        """Get CloudFormation stack outputs, cached in memory and on disk"""
+        if stack_name in self._stack_outputs:
+            return self._stack_outputs[stack_name]
+        
+        cache = self._read_stack_outputs_cache()
+        cache_key = f"{self.source_account_id}:{stack_name}"
+        
+        if cache_key in cache:
+            self._stack_outputs[stack_name] = cache[cache_key]
+        else:
+            self._store_stack_outputs(stack_name, self._describe_stack_outputs(stack_name), cache)
+        
+        return self._stack_outputs[stack_name]
+
     def create_backup_role(self) -> str:
         """Create IAM role for AWS Backup service"""
         role_name = "AWSBackupServiceRole-RedshiftDemo"
@@ -61,7 +178,10 @@ class AWSBackupDemo:
             # Check if role already exists
             self.source_iam.get_role(RoleName=role_name)
             print(f"IAM role {role_name} already exists")
-        except self.source_iam.exceptions.NoSuchEntityException:
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchEntity':
+                raise
+            
             # Create the role
             print(f"Creating IAM role: {role_name}")
             self.source_iam.create_role(
@@ -76,13 +196,27 @@ class AWSBackupDemo:
                 PolicyArn="arn:aws:iam::aws:policy/service-role/AWSBackupServiceRolePolicyForBackup"
             )
             
-            # Wait for role to be available
-            time.sleep(10)
+            # get_role succeeds straight away, but AWS Backup may not be able to
+            # assume the role yet; calls that pass it retry via _call_with_role
         
         role_arn = f"arn:aws:iam::{self.source_account_id}:role/{role_name}"
         print(f"Using IAM role: {role_arn}")
         return role_arn
 
+    def _call_with_role(self, call: Callable[..., Any], **kwargs) -> Any:
+        """Call an API that passes an IAM role, backing off while a new role propagates"""
+        for delay in ROLE_PROPAGATION_DELAYS:
+            try:
+                return call(**kwargs)
+            except ClientError as e:
+                error = e.response['Error']
+                if (error['Code'] not in ('AccessDeniedException', 'InvalidParameterValueException')
+                        or 'role' not in error.get('Message', '').lower()):
+                    raise
+                print(f"IAM role not usable yet, retrying in {delay}s: {error.get('Message')}")
+                time.sleep(delay)
+        return call(**kwargs)
+
     def create_backup_vault(self, vault_name: str) -> str:
         """Create backup vault in source account"""
         print(f"Creating backup vault: {vault_name}")
@@ -100,7 +234,10 @@ class AWSBackupDemo:
             print(f"Backup vault created: {vault_arn}")
             return vault_arn
             
-        except self.source_backup.exceptions.AlreadyExistsException:
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AlreadyExistsException':
+                raise
+            
             print(f"Backup vault {vault_name} already exists")
             response = self.source_backup.describe_backup_vault(BackupVaultName=vault_name)
             return response['BackupVaultArn']
@@ -109,6 +246,8 @@ class AWSBackupDemo:
         """Create backup plan for Redshift"""
         print(f"Creating backup plan: {plan_name}")
         
+        parameter_name = f"/aca/backup-plan-id/{plan_name}"
+        
         backup_plan = {
             "BackupPlanName": plan_name,
             "Rules": [
@@ -139,17 +278,32 @@ class AWSBackupDemo:
             
             plan_id = response['BackupPlanId']
             print(f"Backup plan created: {plan_id}")
+            self._save_id(parameter_name, plan_id)
             return plan_id
             
-        except self.source_backup.exceptions.AlreadyExistsException:
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AlreadyExistsException':
+                print(f"Error creating backup plan: {str(e)}")
+                raise
+            
             print(f"Backup plan {plan_name} already exists, finding existing plan...")
+            plan_id = self._get_saved_id(
+                parameter_name,
+                lambda saved_id: 'DeletionDate' not in self.source_backup.get_backup_plan(BackupPlanId=saved_id)
+            )
+            if plan_id:
+                print(f"Using existing backup plan: {plan_id}")
+                return plan_id
+            
             # Find existing plan
-            plans = self.source_backup.list_backup_plans()
-            for plan in plans['BackupPlansList']:
-                if plan['BackupPlanName'] == plan_name:
-                    plan_id = plan['BackupPlanId']
-                    print(f"Using existing backup plan: {plan_id}")
-                    return plan_id
+            paginator = self.source_backup.get_paginator('list_backup_plans')
+            for page in paginator.paginate():
+                for plan in page['BackupPlansList']:
+                    if plan['BackupPlanName'] == plan_name:
+                        plan_id = plan['BackupPlanId']
+                        print(f"Using existing backup plan: {plan_id}")
+                        self._save_id(parameter_name, plan_id)
+                        return plan_id
             raise Exception("Could not find existing backup plan")
         except Exception as e:
             print(f"Error creating backup plan: {str(e)}")
@@ -161,6 +315,8 @@ class AWSBackupDemo:
         
         print(f"Creating backup selection: {selection_name}")
         
+        parameter_name = f"/aca/backup-selection-id/{plan_id}/{selection_name}"
+        
         backup_selection = {
             "SelectionName": selection_name,
             "IamRoleArn": role_arn,
@@ -168,24 +324,40 @@ class AWSBackupDemo:
         }
         
         try:
-            response = self.source_backup.create_backup_selection(
+            response = self._call_with_role(
+                self.source_backup.create_backup_selection,
                 BackupPlanId=plan_id,
                 BackupSelection=backup_selection
             )
             
             selection_id = response['SelectionId']
             print(f"Backup selection created: {selection_id}")
+            self._save_id(parameter_name, selection_id)
             return selection_id
             
-        except self.source_backup.exceptions.AlreadyExistsException:
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AlreadyExistsException':
+                print(f"Error creating backup selection: {str(e)}")
+                raise
+            
             print(f"Backup selection {selection_name} already exists, finding existing selection...")
+            selection_id = self._get_saved_id(
+                parameter_name,
+                lambda saved_id: bool(self.source_backup.get_backup_selection(BackupPlanId=plan_id, SelectionId=saved_id))
+            )
+            if selection_id:
+                print(f"Using existing backup selection: {selection_id}")
+                return selection_id
+            
             # Find existing selection
-            selections = self.source_backup.list_backup_selections(BackupPlanId=plan_id)
-            for selection in selections['BackupSelectionsList']:
-                if selection['SelectionName'] == selection_name:
-                    selection_id = selection['SelectionId']
-                    print(f"Using existing backup selection: {selection_id}")
-                    return selection_id
+            paginator = self.source_backup.get_paginator('list_backup_selections')
+            for page in paginator.paginate(BackupPlanId=plan_id):
+                for selection in page['BackupSelectionsList']:
+                    if selection['SelectionName'] == selection_name:
+                        selection_id = selection['SelectionId']
+                        print(f"Using existing backup selection: {selection_id}")
+                        self._save_id(parameter_name, selection_id)
+                        return selection_id
             raise Exception("Could not find existing backup selection")
         except Exception as e:
             print(f"Error creating backup selection: {str(e)}")
@@ -195,12 +367,17 @@ class AWSBackupDemo:
         """Start an on-demand backup job"""
         print("Starting on-demand backup job...")
         
+        # One token per call: botocore's retries of this request reuse it and
+        # don't start a duplicate backup, but a later run always gets a new job
+        idempotency_token = str(uuid.uuid4())
+        
         try:
-            response = self.source_backup.start_backup_job(
+            response = self._call_with_role(
+                self.source_backup.start_backup_job,
                 BackupVaultName=vault_name,
                 ResourceArn=resource_arn,
                 IamRoleArn=role_arn,
-                IdempotencyToken=str(int(time.time()))
+                IdempotencyToken=idempotency_token
             )
             
             job_id = response['BackupJobId']
@@ -211,44 +388,109 @@ class AWSBackupDemo:
             print(f"Error starting backup job: {str(e)}")
             raise
 
-    def wait_for_backup_completion(self, job_id: str, timeout: int = 3600):
+    def _check_backup_job(self, job_id: str) -> str:
+        """Return the recovery point ARN if the job has completed, or None while it is still running"""
+        # Throttling is retried inside botocore; anything else surfaces immediately
+        response = self.source_backup.describe_backup_job(BackupJobId=job_id)
+        status = response['State']
+        
+        print(f"Backup job status: {status}")
+        
+        if status == 'COMPLETED':
+            recovery_point_arn = response['RecoveryPointArn']
+            print(f"Backup completed successfully: {recovery_point_arn}")
+            return recovery_point_arn
+        elif status in ['FAILED', 'ABORTED', 'EXPIRED']:
+            raise Exception(f"Backup job failed with status: {status}")
+        
+        return None
+
+    def wait_for_backup_completion(self, job_id: str, timeout: int = 3600, queue_url: str = None):
         """Wait for backup job to complete"""
         print("Waiting for backup to complete...")
+        
         start_time = time.time()
         
+        # The job may already be finished, and its event already consumed
+        recovery_point_arn = self._check_backup_job(job_id)
+        if recovery_point_arn:
+            return recovery_point_arn
+        
+        if queue_url:
+            recovery_point_arn = self._wait_for_backup_event(job_id, queue_url, start_time + timeout)
+            if recovery_point_arn:
+                return recovery_point_arn
+            print("Backup job events unavailable, polling instead")
+        
+        # AWS Backup has no waiter for backup jobs, so back off exponentially
+        # (5s, 10s, 20s, ... capped at 60s) instead of sleeping a full minute
+        delay = 5
+        
         while time.time() - start_time < timeout:
+            time.sleep(delay)
+            delay = min(60, delay * 2)
+            
+            recovery_point_arn = self._check_backup_job(job_id)
+            if recovery_point_arn:
+                return recovery_point_arn
+        
+        raise Exception("Timeout waiting for backup completion")
+
+    def _wait_for_backup_event(self, job_id: str, queue_url: str, deadline: float) -> str:
+        """Wait for the backup job, woken early by EventBridge-fed SQS events; None if the queue can't be read"""
+        print(f"Listening for backup job events on: {queue_url}")
+        
+        while time.time() < deadline:
             try:
-                response = self.source_backup.describe_backup_job(BackupJobId=job_id)
-                status = response['State']
-                
-                print(f"Backup job status: {status}")
-                
-                if status == 'COMPLETED':
-                    recovery_point_arn = response['RecoveryPointArn']
-                    print(f"Backup completed successfully: {recovery_point_arn}")
-                    return recovery_point_arn
-                elif status in ['FAILED', 'ABORTED', 'EXPIRED']:
-                    raise Exception(f"Backup job failed with status: {status}")
-                
-                time.sleep(60)  # Check every minute
+                response = self.source_sqs.receive_message(
+                    QueueUrl=queue_url,
+                    WaitTimeSeconds=20,
+                    MaxNumberOfMessages=10
+                )
+            except ClientError as e:
+                print(f"Could not read backup job events: {str(e)}")
+                return None
+            
+            for message in response.get('Messages', []):
+                try:
+                    detail = json.loads(message['Body']).get('detail', {})
+                except ValueError:
+                    continue
+                if detail.get('backupJobId') != job_id:
+                    continue
                 
-            except Exception as e:
-                print(f"Error checking backup status: {str(e)}")
-                time.sleep(60)
+                try:
+                    self.source_sqs.delete_message(
+                        QueueUrl=queue_url,
+                        ReceiptHandle=message['ReceiptHandle']
+                    )
+                except ClientError as e:
+                    print(f"Could not delete backup job event: {str(e)}")
+            
+            # Check the job whether or not an event arrived, so a missed event
+            # costs at most one long poll
+            recovery_point_arn = self._check_backup_job(job_id)
+            if recovery_point_arn:
+                return recovery_point_arn
         
         raise Exception("Timeout waiting for backup completion")
 
     def copy_backup_to_target_account(self, source_recovery_point_arn: str, 
-                                    target_vault_name: str) -> str:
-        """Copy backup to target account vault"""
+                                    target_vault_name: str, source_vault_name: str,
+                                    role_arn: str = None) -> str:
+        """Start a cross-account copy; completion is reported via EventBridge, not polled"""
         print(f"Copying backup to target account vault: {target_vault_name}")
         
+        if role_arn is None:
+            role_arn = f"arn:aws:iam::{self.source_account_id}:role/AWSBackupServiceRole-RedshiftDemo"
+        
         try:
-            response = self.source_backup.start_copy_job(
+            response = self._call_with_role(
+                self.source_backup.start_copy_job,
                 RecoveryPointArn=source_recovery_point_arn,
-                SourceBackupVaultName=source_recovery_point_arn.split('/')[-2],
+                SourceBackupVaultName=source_vault_name,
                 DestinationBackupVaultArn=f"arn:aws:backup:us-east-1:{self.target_account_id}:backup-vault:{target_vault_name}",
-                IamRoleArn=f"arn:aws:iam::{self.source_account_id}:role/AWSBackupServiceRole-RedshiftDemo"
+                IamRoleArn=role_arn
             )
             
             copy_job_id = response['CopyJobId']
@@ -264,11 +506,11 @@ class AWSBackupDemo:
         print(f"Listing recovery points in vault: {vault_name}")
         
         try:
-            response = self.source_backup.list_recovery_points_by_backup_vault(
-                BackupVaultName=vault_name
-            )
+            paginator = self.source_backup.get_paginator('list_recovery_points_by_backup_vault')
+            recovery_points = []
+            for page in paginator.paginate(BackupVaultName=vault_name):
+                recovery_points.extend(page.get('RecoveryPoints', []))
             
-            recovery_points = response.get('RecoveryPoints', [])
             print(f"Found {len(recovery_points)} recovery points")
             
             for rp in recovery_points:
@@ -312,7 +554,8 @@ def main():
     
     # Initialize demo with your account configuration
     # Using your configured AWS profiles
-    demo = AWSBackupDemo(source_profile='source', target_profile='target')
+    demo = AWSBackupDemo(source_profile='source', target_profile='target',
+                         prefetch_stacks=('aca-redshift-source',))
     
     # Verify we're using the correct accounts
     expected_source = "164543933824"
@@ -328,14 +571,12 @@ def main():
     
     # Get configuration from CloudFormation stacks
     try:
-        cf_client = demo.source_session.client('cloudformation')
-        source_stack = cf_client.describe_stacks(StackName='aca-redshift-source')
-        source_outputs = {output['OutputKey']: output['OutputValue'] 
-                         for output in source_stack['Stacks'][0]['Outputs']}
+        source_outputs = demo.get_stack_outputs('aca-redshift-source')
         
         vault_name = source_outputs['BackupVaultName']
         cluster_arn = source_outputs['ClusterArn']
         role_arn = source_outputs['BackupRoleArn']
+        events_queue_url = source_outputs.get('BackupEventsQueueUrl')
         target_vault_name = "aca-redshift-cross-account-vault"
         
         print(f"Using CloudFormation resources:")
@@ -353,14 +594,13 @@ def main():
         job_id = demo.start_backup_job(vault_name, cluster_arn, role_arn)
         
         # Step 2: Wait for backup completion
-        recovery_point_arn = demo.wait_for_backup_completion(job_id)
+        recovery_point_arn = demo.wait_for_backup_completion(job_id, queue_url=events_queue_url)
         
-        # Step 3: List recovery points
-        demo.list_recovery_points(vault_name)
+        # Step 3: Queue the cross-account copy without waiting for it
+        demo.copy_backup_to_target_account(recovery_point_arn, target_vault_name, vault_name, role_arn)
         
-        # Note: Cross-account copy is handled automatically by the backup plan
-        print("\nNote: Cross-account backup copy is configured in the backup plan")
-        print("Check the target account backup vault for copied recovery points")
+        print("\nCopy queued; watch EventBridge for completion.")
+        print("The aca-redshift-copy-job-handler Lambda logs the final copy job state")
         
         print("\n=== AWS Backup demo completed successfully! ===")
         print("Check the AWS Backup console to monitor backup and copy jobs.")
@@ -19,32 +19,187 @@ Demonstrates cross-account snapshot sharing using native Redshift capabilities
 """
 
 import boto3
+import copy
+import functools
 import json
+import logging
+import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.exceptions import ClientError, WaiterError
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shared by every client: enough pooled connections for the parallel cleanup
+# workers, keepalive across polls, and client-side pacing when throttled
+CLIENT_CONFIG = Config(
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True,
+    max_pool_connections=32
+)
+
+def _ts() -> str:
+    """Timestamp suffix used in demo snapshot identifiers"""
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+# Account IDs already resolved in this process, keyed by (profile, region)
+_IDENTITY_CACHE = {}
+
+def _get_account_id(session: boto3.Session, get_sts_client: Callable[[], Any]) -> str:
+    """Get the account ID for a session, calling STS only once per profile and region"""
+    key = (session.profile_name, session.region_name)
+    if key not in _IDENTITY_CACHE:
+        _IDENTITY_CACHE[key] = get_sts_client().get_caller_identity()['Account']
+    return _IDENTITY_CACHE[key]
+
+# How long a describe result showing an available snapshot may be reused
+SNAPSHOT_DESCRIBE_CACHE_TTL = 5  # seconds
+
+# Queue fed by the source stack's EventBridge rule for Redshift events
+SNAPSHOT_EVENTS_QUEUE_NAME = 'aca-redshift-snapshot-events'
+
+# Subnet group names resolved on earlier runs, keyed by profile, region and stack
+# (the name is generated by CloudFormation, so it changes on every redeploy)
+SUBNET_GROUP_CACHE_FILE = os.path.expanduser('~/.cache/aca-demo/subnet.json')
+SUBNET_GROUP_CACHE_TTL = 600  # 10 minutes
+
+@functools.lru_cache(maxsize=8)
+def get_target_subnet_group(stack_name: str = 'aca-redshift-target', profile_name: str = None) -> str:
+    """Get the target subnet group name from CloudFormation, cached in memory and on disk"""
+    session = boto3.Session(profile_name=profile_name) if profile_name else boto3.Session()
+    cache_key = f"{profile_name}:{session.region_name}:{stack_name}"
+    
+    cache = {}
+    try:
+        if time.time() - os.path.getmtime(SUBNET_GROUP_CACHE_FILE) < SUBNET_GROUP_CACHE_TTL:
+            with open(SUBNET_GROUP_CACHE_FILE) as f:
+                cache = json.load(f)
+    except (OSError, ValueError):
+        pass
+    
+    if cache_key in cache:
+        logger.info("Using target subnet group: %s", cache[cache_key])
+        return cache[cache_key]
+    
+    try:
+        cf_client = session.client('cloudformation', config=CLIENT_CONFIG)
+        response = cf_client.describe_stacks(StackName=stack_name)
+        outputs = response['Stacks'][0]['Outputs']
+        target_subnet_group = next(
+            output['OutputValue'] for output in outputs 
+            if output['OutputKey'] == 'TargetSubnetGroupName'
+        )
+        logger.info("Using target subnet group: %s", target_subnet_group)
+    except Exception as e:
+        logger.warning("Could not get subnet group from CloudFormation: %s", e)
+        return "aca-redshift-target-subnet-group"  # fallback
+    
+    cache[cache_key] = target_subnet_group
+    try:
+        os.makedirs(os.path.dirname(SUBNET_GROUP_CACHE_FILE), exist_ok=True)
+        with open(SUBNET_GROUP_CACHE_FILE, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        logger.warning("Could not cache subnet group: %s", e)
+    
+    return target_subnet_group
+
+def forget_target_subnet_group():
+    """Drop cached subnet group names, e.g. after the target stack was redeployed"""
+    get_target_subnet_group.cache_clear()
+    try:
+        os.remove(SUBNET_GROUP_CACHE_FILE)
+    except OSError:
+        pass
 
 class RedshiftSnapshotDemo:
-    def __init__(self, source_profile: str = None, target_profile: str = None):
+    def __init__(self, source_profile: str = None, target_profile: str = None,
+                 source_account_id: str = None, target_account_id: str = None):
         """Initialize with AWS profiles for source and target accounts"""
         self.source_session = boto3.Session(profile_name=source_profile) if source_profile else boto3.Session()
         self.target_session = boto3.Session(profile_name=target_profile) if target_profile else boto3.Session()
         
-        self.source_redshift = self.source_session.client('redshift')
-        self.target_redshift = self.target_session.client('redshift')
+        self.source_redshift = self.source_session.client('redshift', config=CLIENT_CONFIG)
+        self.target_redshift = self.target_session.client('redshift', config=CLIENT_CONFIG)
+        self.source_sqs = self.source_session.client('sqs', config=CLIENT_CONFIG)
+        self._snapshot_events_queue_url = None
+        self._source_sts = None
+        self._target_sts = None
         
-        self.source_account_id = self.source_session.client('sts').get_caller_identity()['Account']
-        self.target_account_id = self.target_session.client('sts').get_caller_identity()['Account']
+        # Threads that wait for restored clusters; created on first restore_and_wait
+        self._restore_executor = None
         
-        print(f"Source Account: {self.source_account_id}")
-        print(f"Target Account: {self.target_account_id}")
+        # Reuse a fresh 'available' describe result instead of asking again
+        # right away. In this demo that only saves the share pre-check straight
+        # after the wait: waiter polls are 15s apart, beyond the TTL, and
+        # botocore retries happen below these hooks
+        self._snapshot_describe_cache = {}
+        events = self.source_redshift.meta.events
+        events.register('before-parameter-build.redshift', self._remember_snapshot_identifier)
+        events.register('before-call.redshift.DescribeClusterSnapshots', self._reuse_snapshot_describe)
+        events.register('after-call.redshift.DescribeClusterSnapshots', self._record_snapshot_describe)
+        events.register('after-call.redshift.AuthorizeSnapshotAccess', self._forget_snapshot_describe)
+        events.register('after-call.redshift.DeleteClusterSnapshot', self._forget_snapshot_describe)
+        
+        # Known account IDs can be passed in to skip the STS lookup entirely
+        self.source_account_id = source_account_id or _get_account_id(self.source_session, lambda: self.source_sts)
+        self.target_account_id = target_account_id or _get_account_id(self.target_session, lambda: self.target_sts)
+        self._source_prefix = f"{self.source_account_id}:"
+        
+        logger.info("Source Account: %s", self.source_account_id)
+        logger.info("Target Account: %s", self.target_account_id)
+
+    def _remember_snapshot_identifier(self, params, context, **kwargs):
+        """Note which snapshot a source Redshift call is about"""
+        context['snapshot_identifier'] = params.get('SnapshotIdentifier')
+
+    def _reuse_snapshot_describe(self, context, **kwargs):
+        """Answer a describe from the cache while the last result is still fresh"""
+        cached = self._snapshot_describe_cache.get(context.get('snapshot_identifier'))
+        if cached and time.time() - cached[0] < SNAPSHOT_DESCRIBE_CACHE_TTL:
+            context['snapshot_describe_cached'] = True
+            # Callers get their own copy so they can't alter the cached result
+            return AWSResponse(None, 200, {}, None), copy.deepcopy(cached[1])
+        return None
+
+    def _record_snapshot_describe(self, http_response, parsed, context, **kwargs):
+        """Cache describe results for snapshots that have finished creating"""
+        # A cached answer must not refresh its own timestamp, or the TTL never expires
+        if context.get('snapshot_describe_cached'):
+            return
+        snapshot_identifier = context.get('snapshot_identifier')
+        snapshots = parsed.get('Snapshots', [])
+        if (snapshot_identifier and http_response.status_code == 200
+                and snapshots and snapshots[0]['Status'] == 'available'):
+            self._snapshot_describe_cache[snapshot_identifier] = (time.time(), copy.deepcopy(parsed))
+
+    def _forget_snapshot_describe(self, context, **kwargs):
+        """Drop the cached describe once the snapshot changes"""
+        self._snapshot_describe_cache.pop(context.get('snapshot_identifier'), None)
+
+    @property
+    def source_sts(self):
+        """STS client for the source account, built on first use"""
+        if self._source_sts is None:
+            self._source_sts = self.source_session.client('sts', config=CLIENT_CONFIG)
+        return self._source_sts
+
+    @property
+    def target_sts(self):
+        """STS client for the target account, built on first use"""
+        if self._target_sts is None:
+            self._target_sts = self.target_session.client('sts', config=CLIENT_CONFIG)
+        return self._target_sts
 
     def create_manual_snapshot(self, cluster_identifier: str) -> str:
         """Create a manual snapshot of the Redshift cluster"""
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        snapshot_identifier = f"demo-snapshot-{timestamp}"
+        snapshot_identifier = f"demo-snapshot-{_ts()}"
         
-        print(f"Creating manual snapshot: {snapshot_identifier}")
+        logger.info("Creating manual snapshot: %s", snapshot_identifier)
         
         try:
             response = self.source_redshift.create_cluster_snapshot(
@@ -57,109 +212,191 @@ class RedshiftSnapshotDemo:
             )
             
             # Wait for snapshot to complete
-            self._wait_for_snapshot_completion(snapshot_identifier)
+            self._wait_for_snapshot_completion(snapshot_identifier, cluster_identifier)
             
-            print(f"Snapshot created successfully: {snapshot_identifier}")
+            logger.info("Snapshot created successfully: %s", snapshot_identifier)
             return snapshot_identifier
             
         except Exception as e:
-            print(f"Error creating snapshot: {str(e)}")
+            logger.error("Error creating snapshot: %s", e)
             raise
 
-    def _wait_for_snapshot_completion(self, snapshot_identifier: str, timeout: int = 1800):
-        """Wait for snapshot to complete (up to 30 minutes)"""
-        print("Waiting for snapshot to complete...")
-        start_time = time.time()
+    def _get_snapshot_events_queue_url(self) -> Optional[str]:
+        """Get the Redshift events queue URL, or None if the source stack has no queue"""
+        if self._snapshot_events_queue_url is None:
+            try:
+                response = self.source_sqs.get_queue_url(QueueName=SNAPSHOT_EVENTS_QUEUE_NAME)
+                self._snapshot_events_queue_url = response['QueueUrl']
+            except ClientError as e:
+                logger.info("No snapshot events queue, polling instead: %s", e)
+                self._snapshot_events_queue_url = ''
+        return self._snapshot_events_queue_url or None
+
+    def _wait_for_snapshot_event(self, snapshot_identifier: str, cluster_identifier: Optional[str],
+                                 queue_url: str, deadline: float) -> bool:
+        """Wait for the snapshot, woken early by EventBridge-fed SQS events; False if the queue can't be read"""
+        logger.info("Listening for snapshot events on: %s", queue_url)
+        
+        # Redshift may report a snapshot event against the snapshot or its cluster
+        source_identifiers = {snapshot_identifier, cluster_identifier} - {None}
         
-        while time.time() - start_time < timeout:
+        while time.time() < deadline:
             try:
-                response = self.source_redshift.describe_cluster_snapshots(
-                    SnapshotIdentifier=snapshot_identifier
+                response = self.source_sqs.receive_message(
+                    QueueUrl=queue_url,
+                    WaitTimeSeconds=20,
+                    MaxNumberOfMessages=10
                 )
+            except ClientError as e:
+                logger.warning("Could not read snapshot events: %s", e)
+                return False
+            
+            for message in response.get('Messages', []):
+                try:
+                    detail = json.loads(message['Body']).get('detail', {})
+                except ValueError:
+                    continue
+                if detail.get('SourceIdentifier') not in source_identifiers:
+                    continue
                 
-                if response['Snapshots']:
-                    status = response['Snapshots'][0]['Status']
-                    print(f"Snapshot status: {status}")
-                    
-                    if status == 'available':
-                        return True
-                    elif status == 'failed':
-                        raise Exception("Snapshot creation failed")
-                
-                time.sleep(30)  # Check every 30 seconds
-                
-            except Exception as e:
-                print(f"Error checking snapshot status: {str(e)}")
-                time.sleep(30)
+                try:
+                    self.source_sqs.delete_message(
+                        QueueUrl=queue_url,
+                        ReceiptHandle=message['ReceiptHandle']
+                    )
+                except ClientError as e:
+                    logger.warning("Could not delete snapshot event: %s", e)
+            
+            # Check the snapshot whether or not an event arrived, so a missed
+            # or unrecognised event costs at most one long poll
+            response = self.source_redshift.describe_cluster_snapshots(
+                SnapshotIdentifier=snapshot_identifier
+            )
+            status = response['Snapshots'][0]['Status']
+            logger.info("Snapshot status: %s", status)
+            
+            if status == 'available':
+                return True
+            if status == 'failed':
+                raise Exception("Snapshot creation failed")
         
         raise Exception("Timeout waiting for snapshot completion")
 
-    def share_snapshot_with_account(self, snapshot_identifier: str) -> bool:
-        """Share snapshot with target account"""
-        print(f"Sharing snapshot {snapshot_identifier} with account {self.target_account_id}")
+    def _wait_for_snapshot_completion(self, snapshot_identifier: str, cluster_identifier: str = None,
+                                      timeout: int = 1800):
+        """Wait for snapshot to complete (up to 30 minutes)"""
+        logger.info("Waiting for snapshot to complete...")
+        
+        queue_url = self._get_snapshot_events_queue_url()
+        if queue_url:
+            if self._wait_for_snapshot_event(snapshot_identifier, cluster_identifier,
+                                             queue_url, time.time() + timeout):
+                return True
+            logger.info("Snapshot events unavailable, polling instead")
+        
+        waiter = self.source_redshift.get_waiter('snapshot_available')
         
         try:
+            waiter.wait(
+                SnapshotIdentifier=snapshot_identifier,
+                WaiterConfig={'Delay': 15, 'MaxAttempts': timeout // 15}
+            )
+            return True
+            
+        except WaiterError as e:
+            if 'Max attempts exceeded' in str(e):
+                raise Exception("Timeout waiting for snapshot completion")
+            raise Exception(f"Snapshot creation failed: {str(e)}")
+
+    def _authorize_one(self, snapshot_identifier: str, account_id: str) -> bool:
+        """Grant one account restore access to one snapshot"""
+        logger.info("Sharing snapshot %s with account %s", snapshot_identifier, account_id)
+        
+        try:
+            # Skip the mutating call if the account already has access
+            response = self.source_redshift.describe_cluster_snapshots(
+                SnapshotIdentifier=snapshot_identifier
+            )
+            snapshots = response.get('Snapshots', [])
+            if snapshots and any(
+                account['AccountId'] == account_id
+                for account in snapshots[0].get('AccountsWithRestoreAccess', [])
+            ):
+                logger.info("Snapshot already shared with account %s", account_id)
+                return True
+            
             response = self.source_redshift.authorize_snapshot_access(
                 SnapshotIdentifier=snapshot_identifier,
-                AccountWithRestoreAccess=self.target_account_id
+                AccountWithRestoreAccess=account_id
             )
             
-            print("Snapshot shared successfully")
+            logger.info("Snapshot shared successfully")
             return True
             
         except Exception as e:
-            print(f"Error sharing snapshot: {str(e)}")
+            logger.error("Error sharing snapshot: %s", e)
             return False
 
-    def list_shared_snapshots(self) -> list:
-        """List snapshots shared with target account"""
-        print("Listing shared snapshots in target account...")
+    def share_snapshot_with_account(self, snapshot_identifier: str) -> bool:
+        """Share snapshot with target account"""
+        return self._authorize_one(snapshot_identifier, self.target_account_id)
+
+    def share_snapshots_with_accounts(self, pairs: List[Tuple[str, str]]) -> List[bool]:
+        """Share many (snapshot, account) pairs concurrently"""
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            futures = [executor.submit(self._authorize_one, snapshot_id, account_id)
+                       for snapshot_id, account_id in pairs]
+            return [future.result() for future in futures]
+
+    def list_shared_snapshots(self, snapshot_identifier: str = None) -> Iterator[Dict[str, Any]]:
+        """Yield snapshots shared with target account, fetching pages only as needed"""
+        logger.info("Listing shared snapshots in target account...")
+        
+        # A known identifier turns the scan into a point lookup
+        describe_args = {'OwnerAccount': self.source_account_id}
+        if snapshot_identifier:
+            describe_args['SnapshotIdentifier'] = snapshot_identifier
+        else:
+            describe_args['SnapshotType'] = 'manual'
         
         try:
-            response = self.target_redshift.describe_cluster_snapshots(
-                SnapshotType='manual',
-                OwnerAccount=self.source_account_id
-            )
-            
-            snapshots = response.get('Snapshots', [])
-            print(f"Found {len(snapshots)} shared snapshots")
-            
-            for snapshot in snapshots:
-                print(f"  - {snapshot['SnapshotIdentifier']} ({snapshot['Status']})")
+            paginator = self.target_redshift.get_paginator('describe_cluster_snapshots')
+            pages = paginator.paginate(**describe_args, PaginationConfig={'PageSize': 100})
             
-            return snapshots
+            for page in pages:
+                for snapshot in page['Snapshots']:
+                    logger.info("  - %s (%s)", snapshot['SnapshotIdentifier'], snapshot['Status'])
+                    yield snapshot
             
         except Exception as e:
-            print(f"Error listing shared snapshots: {str(e)}")
-            return []
+            logger.error("Error listing shared snapshots: %s", e)
 
-    def copy_snapshot_to_target(self, source_snapshot_identifier: str, target_cluster_identifier: str) -> str:
+    def copy_snapshot_to_target(self, source_snapshot_identifier: str, source_cluster_identifier: str) -> str:
         """Copy shared snapshot in target account"""
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        target_snapshot_identifier = f"copied-{source_snapshot_identifier}-{timestamp}"
+        target_snapshot_identifier = f"copied-{source_snapshot_identifier}-{_ts()}"
         
-        print(f"Copying snapshot to target account: {target_snapshot_identifier}")
+        logger.info("Copying snapshot to target account: %s", target_snapshot_identifier)
         
         try:
             # For cross-account snapshots, we need to specify the source account
-            full_source_snapshot_id = f"{self.source_account_id}:{source_snapshot_identifier}"
+            full_source_snapshot_id = self._source_prefix + source_snapshot_identifier
             response = self.target_redshift.copy_cluster_snapshot(
                 SourceSnapshotIdentifier=full_source_snapshot_id,
                 SourceSnapshotClusterIdentifier=source_cluster_identifier,
                 TargetSnapshotIdentifier=target_snapshot_identifier
             )
             
-            print(f"Snapshot copy initiated: {target_snapshot_identifier}")
+            logger.info("Snapshot copy initiated: %s", target_snapshot_identifier)
             return target_snapshot_identifier
             
         except Exception as e:
-            print(f"Error copying snapshot: {str(e)}")
+            logger.error("Error copying snapshot: %s", e)
             raise
 
     def restore_cluster_from_snapshot(self, snapshot_identifier: str, new_cluster_identifier: str, 
                                     subnet_group_name: str) -> bool:
         """Restore Redshift cluster from snapshot in target account"""
-        print(f"Restoring cluster {new_cluster_identifier} from snapshot {snapshot_identifier}")
+        logger.info("Restoring cluster %s from snapshot %s", new_cluster_identifier, snapshot_identifier)
         
         try:
             response = self.target_redshift.restore_from_cluster_snapshot(
@@ -170,37 +407,94 @@ class RedshiftSnapshotDemo:
                 PubliclyAccessible=False
             )
             
-            print(f"Cluster restore initiated: {new_cluster_identifier}")
+            logger.info("Cluster restore initiated: %s", new_cluster_identifier)
             return True
             
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ClusterSubnetGroupNotFoundFault':
+                # A cached name from before a redeploy; look it up afresh next time
+                forget_target_subnet_group()
+            logger.error("Error restoring cluster: %s", e)
+            return False
         except Exception as e:
-            print(f"Error restoring cluster: {str(e)}")
+            logger.error("Error restoring cluster: %s", e)
             return False
 
-    def cleanup_snapshots(self, snapshot_identifiers: list):
-        """Clean up demo snapshots"""
-        print("Cleaning up snapshots...")
+    def _wait_for_cluster_restored(self, cluster_identifier: str, timeout: int) -> bool:
+        """Block until a restored cluster is available"""
+        waiter = self.target_redshift.get_waiter('cluster_restored')
+        
+        try:
+            waiter.wait(
+                ClusterIdentifier=cluster_identifier,
+                WaiterConfig={'Delay': 30, 'MaxAttempts': timeout // 30}
+            )
+            logger.info("Cluster restored: %s", cluster_identifier)
+            return True
+            
+        except WaiterError as e:
+            logger.error("Cluster %s did not finish restoring: %s", cluster_identifier, e)
+            return False
+
+    def restore_and_wait(self, snapshot_identifier: str, new_cluster_identifier: str,
+                         subnet_group_name: str, timeout: int = 3600) -> Future:
+        """Start a restore and return a Future that resolves to True once the cluster is available"""
+        if not self.restore_cluster_from_snapshot(snapshot_identifier, new_cluster_identifier, subnet_group_name):
+            future = Future()
+            future.set_result(False)
+            return future
         
-        for snapshot_id in snapshot_identifiers:
+        # Several restores can be started back to back and then waited on together
+        if self._restore_executor is None:
+            self._restore_executor = ThreadPoolExecutor(max_workers=8)
+        return self._restore_executor.submit(self._wait_for_cluster_restored, new_cluster_identifier, timeout)
+
+    def close(self):
+        """Finish any outstanding restore waits and release their threads"""
+        if self._restore_executor is not None:
+            self._restore_executor.shutdown()
+            self._restore_executor = None
+
+    def _delete_one(self, snapshot_id: str):
+        """Delete a demo snapshot from whichever account owns it"""
+        try:
+            # Try to delete from source account first
+            self.source_redshift.delete_cluster_snapshot(
+                SnapshotIdentifier=snapshot_id
+            )
+            logger.info("Deleted snapshot from source: %s", snapshot_id)
+        except ClientError as e:
+            # Throttling is retried by the client; anything but a missing snapshot is a real failure
+            if e.response['Error']['Code'] != 'ClusterSnapshotNotFound':
+                logger.warning("Could not delete snapshot %s: %s", snapshot_id, e)
+                return
             try:
-                # Try to delete from source account first
-                self.source_redshift.delete_cluster_snapshot(
+                # Try target account
+                self.target_redshift.delete_cluster_snapshot(
                     SnapshotIdentifier=snapshot_id
                 )
-                print(f"Deleted snapshot from source: {snapshot_id}")
-            except:
-                try:
-                    # Try target account
-                    self.target_redshift.delete_cluster_snapshot(
-                        SnapshotIdentifier=snapshot_id
-                    )
-                    print(f"Deleted snapshot from target: {snapshot_id}")
-                except Exception as e:
-                    print(f"Could not delete snapshot {snapshot_id}: {str(e)}")
+                logger.info("Deleted snapshot from target: %s", snapshot_id)
+            except Exception as e:
+                logger.warning("Could not delete snapshot %s: %s", snapshot_id, e)
+
+    def cleanup_snapshots(self, snapshot_identifiers: list):
+        """Clean up demo snapshots"""
+        logger.info("Cleaning up snapshots...")
+        
+        # Deletes are independent, so overlap their round trips
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(self._delete_one, snapshot_identifiers))
 
 def main():
     """Run the complete demo"""
-    print("=== Redshift Native Snapshot Sharing Demo ===\n")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logger.info("=== Redshift Native Snapshot Sharing Demo ===")
+    
+    # Look up the subnet group in the background while the demo is set up
+    # and the snapshot is created
+    executor = ThreadPoolExecutor(max_workers=1)
+    subnet_group_lookup = executor.submit(get_target_subnet_group, 'aca-redshift-target', 'target')
+    executor.shutdown(wait=False)
     
     # Initialize demo with your account configuration
     # Using your configured AWS profiles
@@ -211,31 +505,17 @@ def main():
     expected_target = "058264155998"
     
     if demo.source_account_id != expected_source:
-        print(f"❌ Warning: Expected source account {expected_source}, got {demo.source_account_id}")
-        print("Make sure your AWS credentials are configured for the source account")
+        logger.warning("Expected source account %s, got %s", expected_source, demo.source_account_id)
+        logger.warning("Make sure your AWS credentials are configured for the source account")
     
     if demo.target_account_id != expected_target:
-        print(f"❌ Warning: Expected target account {expected_target}, got {demo.target_account_id}")
-        print("You'll need to configure target account credentials separately")
+        logger.warning("Expected target account %s, got %s", expected_target, demo.target_account_id)
+        logger.warning("You'll need to configure target account credentials separately")
     
     # Configuration
     source_cluster_id = "aca-redshift-cluster"
     target_cluster_id = "aca-restored-cluster"
     
-    # Get the actual subnet group name from CloudFormation
-    try:
-        cf_client = demo.target_session.client('cloudformation')
-        response = cf_client.describe_stacks(StackName='aca-redshift-target')
-        outputs = response['Stacks'][0]['Outputs']
-        target_subnet_group = next(
-            output['OutputValue'] for output in outputs 
-            if output['OutputKey'] == 'TargetSubnetGroupName'
-        )
-        print(f"Using target subnet group: {target_subnet_group}")
-    except Exception as e:
-        print(f"Could not get subnet group from CloudFormation: {str(e)}")
-        target_subnet_group = "aca-redshift-target-subnet-group"  # fallback
-    
     snapshots_created = []
     
     try:
@@ -246,28 +526,29 @@ def main():
         # Step 2: Share snapshot with target account
         demo.share_snapshot_with_account(snapshot_id)
         
-        # Step 3: List shared snapshots in target account
-        shared_snapshots = demo.list_shared_snapshots()
+        # Step 3: Confirm the snapshot is visible in the target account
+        shared_snapshot = next(demo.list_shared_snapshots(snapshot_id), None)
         
         # Step 4: Copy snapshot in target account (optional - skipping for demo)
-        print("Note: Skipping snapshot copy step - proceeding directly to restore")
+        logger.info("Note: Skipping snapshot copy step - proceeding directly to restore")
         
         # Step 5: Restore cluster from snapshot using shared snapshot
-        if shared_snapshots:
+        if shared_snapshot is not None:
+            target_subnet_group = subnet_group_lookup.result()
             # Use the shared snapshot directly for restore (without account prefix)
             demo.restore_cluster_from_snapshot(snapshot_id, target_cluster_id, target_subnet_group)
         
-        print("\n=== Demo completed successfully! ===")
-        print(f"Restored cluster: {target_cluster_id}")
-        print("Check the AWS console to verify the restored cluster.")
+        logger.info("=== Demo completed successfully! ===")
+        logger.info("Restored cluster: %s", target_cluster_id)
+        logger.info("Check the AWS console to verify the restored cluster.")
         
     except Exception as e:
-        print(f"\nDemo failed: {str(e)}")
+        logger.error("Demo failed: %s", e)
     
     finally:
         # Cleanup (uncomment if you want automatic cleanup)
         # demo.cleanup_snapshots(snapshots_created)
-        pass
+        demo.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file